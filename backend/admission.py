@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+MAX_CONCURRENT_ANALYSES = int(os.getenv("MAX_CONCURRENT_ANALYSES", "2"))
+MAX_QUEUED_ANALYSES = int(os.getenv("MAX_QUEUED_ANALYSES", "8"))
+
+# Lower value = served first when a slot frees up
+PRIORITY_CLASSES = {"fast": 0, "full": 1}
+
+STAGE_TIME_SMOOTHING = 0.2
+DEFAULT_REQUEST_SECONDS = 15.0
+
+
+class OverloadedError(Exception):
+    def __init__(self, retry_after: int, queue_depth: int):
+        super().__init__("Server is busy. Please retry shortly.")
+        self.retry_after = retry_after
+        self.queue_depth = queue_depth
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=MAX_CONCURRENT_ANALYSES, max_queued=MAX_QUEUED_ANALYSES):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.running = {c: 0 for c in PRIORITY_CLASSES}
+        self.stage_seconds = {}
+        self.request_seconds = {}
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    # ---------------------------
+    # Service time tracking
+    # ---------------------------
+
+    def _smooth(self, table, key, seconds):
+        previous = table.get(key)
+        if previous is None:
+            table[key] = seconds
+        else:
+            table[key] = previous + STAGE_TIME_SMOOTHING * (seconds - previous)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._smooth(self.stage_seconds, name, time.perf_counter() - start)
+
+    def expected_request_seconds(self, priority_class: str = "full") -> float:
+        if priority_class in self.request_seconds:
+            return self.request_seconds[priority_class]
+        if self.stage_seconds:
+            return sum(self.stage_seconds.values())
+        return DEFAULT_REQUEST_SECONDS
+
+    def estimate_retry_after(self, priority_class: str = "full") -> int:
+        # Work ahead of us: everything running plus waiters we would not jump ahead of
+        rank = PRIORITY_CLASSES[priority_class]
+        work = sum(
+            count * self.expected_request_seconds(c) for c, count in self.running.items()
+        )
+        work += sum(
+            self.expected_request_seconds(entry[3])
+            for entry in self._waiters
+            if entry[0] <= rank
+        )
+        wait = work / self.max_concurrent + self.expected_request_seconds(priority_class)
+        return max(1, math.ceil(wait))
+
+    # ---------------------------
+    # Slot management
+    # ---------------------------
+
+    def queue_depth(self, priority_class: str = None) -> int:
+        if priority_class is None:
+            return len(self._waiters)
+        rank = PRIORITY_CLASSES[priority_class]
+        return sum(1 for entry in self._waiters if entry[0] == rank)
+
+    def _drop_finished_waiters(self):
+        # Cancelled waiters linger until their task runs its cleanup; ignore them
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        if len(live) != len(self._waiters):
+            self._waiters = live
+            heapq.heapify(self._waiters)
+
+    def _shed_waiter_below(self, rank):
+        # Lowest-priority, newest waiter; only shed if strictly below the newcomer
+        victim = max(self._waiters, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= rank:
+            return False
+
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        self.rejected += 1
+
+        victim_class = victim[3]
+        victim[2].set_exception(
+            OverloadedError(self.estimate_retry_after(victim_class), len(self._waiters))
+        )
+        return True
+
+    async def acquire(self, priority_class: str):
+        rank = PRIORITY_CLASSES[priority_class]
+        self._drop_finished_waiters()
+
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            self.running[priority_class] += 1
+            return
+
+        if len(self._waiters) >= self.max_queued and not (
+            self._waiters and self._shed_waiter_below(rank)
+        ):
+            self.rejected += 1
+            raise OverloadedError(
+                self.estimate_retry_after(priority_class), len(self._waiters)
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (rank, next(self._sequence), future, priority_class)
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Slot was handed over just as the client went away
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+        self.admitted += 1
+        self.running[priority_class] += 1
+
+    def release(self):
+        while self._waiters:
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority_class: str = "full"):
+        await self.acquire(priority_class)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._smooth(
+                self.request_seconds, priority_class, time.perf_counter() - start
+            )
+            self.running[priority_class] -= 1
+            self.release()
+
+    def status(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth(),
+            "max_queued": self.max_queued,
+            "queue_depth_by_class": {c: self.queue_depth(c) for c in PRIORITY_CLASSES},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "stage_seconds": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+            "request_seconds": {k: round(v, 3) for k, v in self.request_seconds.items()},
+            "running_by_class": dict(self.running),
+            "estimated_retry_after": self.estimate_retry_after(),
+        }
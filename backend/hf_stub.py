@@ -0,0 +1,49 @@
+# Local stand-in for the Hugging Face inference endpoint (no network needed)
+# start by uvicorn hf_stub:app --port 8001 -> from backend directory
+# then set HF_API_URL=http://127.0.0.1:8001/generate for the main API
+import os
+import asyncio
+import hashlib
+from io import BytesIO
+
+from fastapi import FastAPI, Request, Response
+from PIL import Image
+
+STUB_LATENCY_SECONDS = float(os.getenv("HF_STUB_LATENCY_SECONDS", "2.0"))
+STUB_IMAGE_SIZE = (1024, 1024)
+
+# Fail every Nth request with 503 to exercise retry/backoff (0 = never)
+STUB_FAIL_EVERY = int(os.getenv("HF_STUB_FAIL_EVERY", "0"))
+
+app = FastAPI(title="HF Inference Stub")
+
+request_count = 0
+
+
+@app.post("/generate")
+async def generate(request: Request):
+    global request_count
+    request_count += 1
+
+    payload = await request.json()
+    prompt = payload.get("inputs", "")
+
+    # Simulated model latency; concurrent requests overlap like the real endpoint
+    await asyncio.sleep(STUB_LATENCY_SECONDS)
+
+    if STUB_FAIL_EVERY and request_count % STUB_FAIL_EVERY == 0:
+        return Response(status_code=503, content="Model is loading")
+
+    # Solid colour derived from the prompt so different captions give different images
+    color = tuple(hashlib.md5(prompt.encode()).digest()[:3])
+    img = Image.new("RGB", STUB_IMAGE_SIZE, color)
+
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+
+    return Response(content=buffered.getvalue(), media_type="image/png")
+
+
+@app.get("/stats")
+async def stats():
+    return {"requests": request_count}
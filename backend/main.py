@@ -1,12 +1,15 @@
 # start by uvicorn main:app --reload -> from backend directory
 # start by streamlit run app.py -> from frontend directory
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+import os
 import shutil
 
 # from dotenv import load_dotenv
 from fastapi import Form
 from services.gemini_service import generate_platform_captions
+from services.image_service import generate_thematic_images, close_client
 from utils import (
     generate_temp_path,
     validate_file_extension,
@@ -20,7 +23,8 @@ from video_processor import (
     calculate_average_motion,
     calculate_text_presence_ratio,
 )
-from thumbnail_engine import extract_top_thumbnails
+from thumbnail_engine import select_top_frames, encode_thumbnail_variants
+from admission import AdmissionController, OverloadedError, PRIORITY_CLASSES
 # load_dotenv()
 
 app = FastAPI(title="Video Intelligence API")
@@ -35,68 +39,130 @@ app.add_middleware(
 
 VALID_PLATFORMS = {"youtube", "instagram", "tiktok"}
 
+# AI thematic images are off by default (HF free tier quota)
+ENABLE_AI_IMAGES = os.getenv("ENABLE_AI_IMAGES", "0") == "1"
 
-@app.post("/analyze")
-async def analyze_video(file: UploadFile = File(...), platform: str = Form(...)):
-    temp_path = None
-
-    try:
-        if platform not in VALID_PLATFORMS:
-            raise ValueError("Invalid platform. Choose youtube, instagram, or tiktok.")
-
-        validate_file_extension(file.filename)
+admission = AdmissionController()
 
-        temp_path = generate_temp_path(file.filename)
 
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+def run_analysis(upload, temp_path: str, platform: str, mode: str):
+    with open(temp_path, "wb") as buffer:
+        shutil.copyfileobj(upload, buffer)
 
-        validate_file_size(temp_path)
+    validate_file_size(temp_path)
 
+    with admission.stage("probe"):
         fps, total_frames, duration = validate_video_duration(temp_path)
 
+    with admission.stage("hard_cuts"):
         hard_cuts = detect_hard_cuts(temp_path, fps)
+    with admission.stage("motion"):
         avg_motion = calculate_average_motion(temp_path, fps)
-        text_ratio = calculate_text_presence_ratio(temp_path, fps)
-
-        thumbnails = extract_top_thumbnails(temp_path, fps, platform)
-
+    ocr_stats = {}
+    with admission.stage("ocr"):
+        text_ratio = calculate_text_presence_ratio(temp_path, fps, stats=ocr_stats)
+
+    with admission.stage("thumbnails"):
+        frames = select_top_frames(temp_path, fps, platform)
+    with admission.stage("encode"):
+        thumbnails = encode_thumbnail_variants(frames)
+
+    metrics = {
+        "fps": round(fps, 2),
+        "total_frames": total_frames,
+        "duration_seconds": round(duration, 2),
+        "hard_cut_count": hard_cuts,
+        "avg_motion_magnitude": round(avg_motion, 4),
+        "text_present_ratio": round(text_ratio, 4),
+        "ocr_calls": ocr_stats.get("ocr_calls", 0),
+        "ocr_calls_saved": ocr_stats.get("ocr_calls_saved", 0),
+    }
+
+    # Fast scan skips the Gemini round-trips entirely
+    if mode == "fast":
+        return {"metrics": metrics, "thumbnails": thumbnails, "captions": []}
+
+    with admission.stage("captions"):
         captions = generate_platform_captions(
             platform=platform,
             video_path=temp_path,
             fps=fps,
         )
-        # ai_results = generate_thematic_images(captions, platform)
-        metrics = {
-            "fps": round(fps, 2),
-            "total_frames": total_frames,
-            "duration_seconds": round(duration, 2),
-            "hard_cut_count": hard_cuts,
-            "avg_motion_magnitude": round(avg_motion, 4),
-            "text_present_ratio": round(text_ratio, 4),
+
+    if captions is None:
+        return {
+            "metrics": metrics,
+            "thumbnails": thumbnails,
+            "captions": ["Caption generation failed. Please retry."],
         }
 
-        if captions is None:
-            return {
-                "metrics": metrics,
-                "thumbnails": thumbnails,
-                "captions": ["Caption generation failed. Please retry."],
-            }
-        # elif ai_results is None:
-        #     return {
-        #         "error": "AI image generation failed. Please retry."
-        #     }
-        else:
-            return {
-                "metrics": metrics,
-                "thumbnails": thumbnails,
-                "captions": captions,
-                # "ai_results": ai_results
-            }
+    return {
+        "metrics": metrics,
+        "thumbnails": thumbnails,
+        "captions": captions,
+        "ai_results": [],
+    }
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_client()
+
+
+@app.get("/admission")
+async def admission_status():
+    return admission.status()
+
+
+@app.post("/analyze")
+async def analyze_video(
+    file: UploadFile = File(...),
+    platform: str = Form(...),
+    mode: str = Form("full"),
+):
+    temp_path = None
+
+    try:
+        if platform not in VALID_PLATFORMS:
+            raise ValueError("Invalid platform. Choose youtube, instagram, or tiktok.")
+
+        if mode not in PRIORITY_CLASSES:
+            raise ValueError("Invalid mode. Choose fast or full.")
+
+        validate_file_extension(file.filename)
+
+        # The upload is already spooled by Starlette; shed load before copying it
+        # and before any CPU work
+        async with admission.slot(mode):
+            temp_path = generate_temp_path(file.filename)
+
+            # Copy + analysis run off the event loop so /admission and 429s stay responsive
+            result = await run_in_threadpool(
+                run_analysis, file.file, temp_path, platform, mode
+            )
+
+        # HF generation is a network wait, so it runs after the CPU slot is released
+        # and stays out of the admission timings
+        if ENABLE_AI_IMAGES and "ai_results" in result:
+            result["ai_results"] = await generate_thematic_images(
+                result["captions"], platform
+            )
+
+        return result
 
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
 
+    except OverloadedError as oe:
+        raise HTTPException(
+            status_code=429,
+            detail=str(oe),
+            headers={
+                "Retry-After": str(oe.retry_after),
+                "X-Queue-Depth": str(oe.queue_depth),
+            },
+        )
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
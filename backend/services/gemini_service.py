@@ -1,10 +1,11 @@
 import os
 import json
+import cv2
 from google import genai
 from thumbnail_engine import select_best_3_thumbnails
 from thumbnail_engine import extract_top_thumbnails
+from thumbnail_engine import decode_base64_to_frame
 from google.genai import types
-import base64 
 # from dotenv import load_dotenv
 
 # load_dotenv()
@@ -16,88 +17,136 @@ client = genai.Client(
 # print("Gemini API Key:", client)
 MODEL_NAME = "gemini-2.5-flash-lite"
 
+# Images are downscaled + recompressed before upload; captions don't need 640 px
+GEMINI_IMAGE_MAX_SIDE = int(os.getenv("GEMINI_IMAGE_MAX_SIDE", "384"))
+GEMINI_IMAGE_QUALITY = int(os.getenv("GEMINI_IMAGE_QUALITY", "75"))
+
+# Caption all thumbnails in a single multi-image request instead of one per image
+GEMINI_BATCH_CAPTIONS = os.getenv("GEMINI_BATCH_CAPTIONS", "1") == "1"
+
+TONE_MAP = {
+    "youtube": "engaging, curiosity-driven, descriptive",
+    "instagram": "emotional, aesthetic, trendy",
+    "tiktok": "short, viral, energetic, hook-based",
+}
+
+# One caption = exactly 3 short lines
+CAPTION_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(type=types.Type.STRING),
+    min_items=3,
+    max_items=3,
+)
 
-def generate_platform_captions(platform: str, video_path=None, fps=None):
-    tone_map = {
-        "youtube": "engaging, curiosity-driven, descriptive",
-        "instagram": "emotional, aesthetic, trendy",
-        "tiktok": "short, viral, energetic, hook-based",
-    }
 
-    tone = tone_map.get(platform.lower(), "engaging")
+def caption_list_schema(count):
+    return types.Schema(
+        type=types.Type.ARRAY,
+        items=CAPTION_SCHEMA,
+        min_items=count,
+        max_items=count,
+    )
 
-    if video_path and fps:
-        initial_10 = extract_top_thumbnails(video_path, fps, platform)
-        best_3 = select_best_3_thumbnails(initial_10)
-    else:
-        print("No video data provided to Gemini.")
-        return None
 
-    all_captions = []
+def build_prompt(platform, tone, image_count):
+    if image_count == 1:
+        task = "Write 1 caption for the attached thumbnail."
+    else:
+        task = f"Write 1 caption per attached thumbnail, in image order ({image_count} total)."
 
-    for idx, thumbnail_base64 in enumerate(best_3):
-        print(f"Sending thumbnail {idx+1} to Gemini...")
+    return (
+        f"Viral thumbnail copywriter. Platform: {platform}. Tone: {tone}. "
+        f"{task} Each caption is exactly 3 short lines. No hashtags."
+    )
 
-        prompt = f"""
-You are a viral thumbnail copywriter.
 
-Platform: {platform}
-Tone: {tone}
+def prepare_image_part(thumbnail_base64):
+    frame = decode_base64_to_frame(thumbnail_base64)
 
-Analyze the attached thumbnail image carefully.
-Generate 3 DIFFERENT captions.
-Each caption must be EXACTLY 3 short lines.
-No hashtags.
+    h, w = frame.shape[:2]
+    longest = max(h, w)
+    if longest > GEMINI_IMAGE_MAX_SIDE:
+        scale = GEMINI_IMAGE_MAX_SIDE / longest
+        frame = cv2.resize(
+            frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+        )
 
-Return ONLY valid JSON like:
+    _, buffer = cv2.imencode(
+        ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, GEMINI_IMAGE_QUALITY]
+    )
 
-[
-  ["line1","line2","line3"],
-  ["line1","line2","line3"],
-  ["line1","line2","line3"]
-]
-"""
+    return types.Part.from_bytes(data=buffer.tobytes(), mime_type="image/jpeg")
 
-        try:
-            # ✅ Convert base64 string → raw bytes
-            image_bytes = base64.b64decode(thumbnail_base64)
 
-            # ✅ Create proper Gemini Part
-            image_part = types.Part.from_bytes(
-                data=image_bytes,
-                mime_type="image/jpeg",
+def request_captions(prompt, image_parts, schema):
+    response = client.models.generate_content(
+        model=MODEL_NAME,
+        contents=[
+            types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=prompt), *image_parts],
             )
+        ],
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=schema,
+        ),
+    )
 
-            # ✅ Proper content format for new SDK
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=[
-                    types.Content(
-                        role="user",
-                        parts=[
-                            types.Part.from_text(text=prompt),
-                            image_part,
-                        ],
-                    )
-                ],
-            )
+    # Schema-constrained output is plain JSON, no bracket hunting needed
+    return json.loads(response.text)
+
+
+def is_valid_caption(caption):
+    return isinstance(caption, list) and len(caption) == 3
+
+
+def generate_platform_captions(platform: str, video_path=None, fps=None):
+    tone = TONE_MAP.get(platform.lower(), "engaging")
+
+    if video_path and fps:
+        initial_10 = extract_top_thumbnails(video_path, fps, platform)
+        best_3 = select_best_3_thumbnails(initial_10)
+    else:
+        print("No video data provided to Gemini.")
+        return None
 
-            raw_text = response.text.strip()
+    if not best_3:
+        print("No thumbnails available for Gemini.")
+        return []
 
-            start = raw_text.find("[")
-            end = raw_text.rfind("]") + 1
-            json_text = raw_text[start:end]
+    try:
+        image_parts = [prepare_image_part(b64) for b64 in best_3]
 
-            captions = json.loads(json_text)
+        if GEMINI_BATCH_CAPTIONS:
+            print(f"Sending {len(image_parts)} thumbnails to Gemini in one request...")
 
-            if isinstance(captions, list) and len(captions) == 3:
-                all_captions.append(captions[0])
-            else:
+            all_captions = request_captions(
+                build_prompt(platform, tone, len(image_parts)),
+                image_parts,
+                caption_list_schema(len(image_parts)),
+            )
+
+            if not isinstance(all_captions, list) or len(all_captions) != len(image_parts):
                 raise ValueError("Invalid caption structure")
+        else:
+            all_captions = []
 
-        except Exception as e:
-            print("Gemini Error:", e)
-            return None
+            for idx, image_part in enumerate(image_parts):
+                print(f"Sending thumbnail {idx+1} to Gemini...")
+
+                all_captions.append(
+                    request_captions(
+                        build_prompt(platform, tone, 1), [image_part], CAPTION_SCHEMA
+                    )
+                )
+
+        if not all(is_valid_caption(c) for c in all_captions):
+            raise ValueError("Invalid caption structure")
+
+    except Exception as e:
+        print("Gemini Error:", e)
+        return None
 
     print("Gemini caption generation complete.")
-    return all_captions
\ No newline at end of file
+    return all_captions
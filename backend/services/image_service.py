@@ -1,8 +1,11 @@
 import os
-import requests
+import asyncio
 import base64
-from PIL import Image
+from collections import OrderedDict
 from io import BytesIO
+
+import httpx
+from PIL import Image
 # from dotenv import load_dotenv
 
 # load_dotenv()
@@ -11,9 +14,62 @@ HF_TOKEN = os.getenv("HF_API_TOKEN")
 # print("HF API Token:", HF_TOKEN)
 # MODEL_ID = "stabilityai/stable-diffusion-xl-base-1.0"
 
-API_URL = "https://router.huggingface.co/hf-inference/models/stabilityai/stable-diffusion-xl-base-1.0"
+# Point HF_API_URL at hf_stub.py to exercise this path without network access
+API_URL = os.getenv(
+    "HF_API_URL",
+    "https://router.huggingface.co/hf-inference/models/stabilityai/stable-diffusion-xl-base-1.0",
+)
 headers = {"Authorization": f"Bearer {HF_TOKEN}", "Content-Type": "application/json"}
 
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("HF_MAX_CONCURRENCY", "3"))
+MAX_RETRIES = int(os.getenv("HF_MAX_RETRIES", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("HF_RETRY_BACKOFF_SECONDS", "1.0"))
+# SDXL cold starts can take well over a minute before the first byte
+HF_READ_TIMEOUT_SECONDS = float(os.getenv("HF_READ_TIMEOUT_SECONDS", "120"))
+REQUEST_TIMEOUT = httpx.Timeout(HF_READ_TIMEOUT_SECONDS, connect=10.0)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Only errors raised before the request reached the server are safe to retry;
+# anything later may resubmit an expensive generation
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+IMAGE_JPEG_QUALITY = int(os.getenv("HF_IMAGE_QUALITY", "85"))
+IMAGE_CACHE_SIZE = int(os.getenv("HF_IMAGE_CACHE_SIZE", "64"))
+
+_client = None
+_semaphore = None
+_image_cache = OrderedDict()
+
+
+def get_client():
+    # One pooled client for the whole process; connections are reused across calls
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=headers,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENT_GENERATIONS,
+                max_keepalive_connections=MAX_CONCURRENT_GENERATIONS,
+            ),
+        )
+    return _client
+
+
+def get_semaphore():
+    # Process-wide cap shared by every in-flight analysis; created on the running loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+    return _semaphore
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 def get_aspect_ratio(platform):
     if platform == "youtube":
@@ -26,10 +82,8 @@ def get_aspect_ratio(platform):
         return (1024, 1024)
 
 
-def generate_image_from_caption(caption_lines, platform):
-    caption_text = " ".join(caption_lines)
-
-    prompt = f"""
+def build_prompt(caption_text):
+    return f"""
 Cinematic social media thumbnail.
 High contrast, dramatic lighting.
 Professional quality.
@@ -37,38 +91,85 @@ No text overlay.
 Scene inspired by: {caption_text}
 """
 
-    try:
-        response = requests.post(
-            API_URL, headers=headers, json={"inputs": prompt}, timeout=120
-        )
 
-        if response.status_code != 200:
-            print("HF Router Error:", response.text)
+def resize_and_encode(image_bytes, platform):
+    img = Image.open(BytesIO(image_bytes)).convert("RGB")
+
+    width, height = get_aspect_ratio(platform)
+    img = img.resize((width, height))
+
+    buffered = BytesIO()
+    img.save(buffered, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
+async def post_with_retry(prompt):
+    client = get_client()
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = await client.post(API_URL, json={"inputs": prompt})
+
+            if response.status_code == 200:
+                return response.content
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                print("HF Router Error:", response.text)
+                return None
+
+            print(f"HF Router busy ({response.status_code}), attempt {attempt + 1}")
+
+        except RETRYABLE_ERRORS as e:
+            print(f"HF Router connection error, attempt {attempt + 1}:", e)
+
+        except httpx.TransportError as e:
+            print("HF Router transport error:", e)
             return None
 
-        image_bytes = response.content
+        if attempt < MAX_RETRIES:
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2**attempt))
 
-        img = Image.open(BytesIO(image_bytes))
+    return None
 
-        width, height = get_aspect_ratio(platform)
-        img = img.resize((width, height))
 
-        buffered = BytesIO()
-        img.save(buffered, format="JPEG", quality=90)
+async def generate_image_from_caption(caption_lines, platform):
+    caption_text = " ".join(caption_lines)
+    cache_key = (caption_text, platform)
 
-        return base64.b64encode(buffered.getvalue()).decode()
+    if cache_key in _image_cache:
+        _image_cache.move_to_end(cache_key)
+        return _image_cache[cache_key]
+
+    try:
+        async with get_semaphore():
+            image_bytes = await post_with_retry(build_prompt(caption_text))
+
+        if image_bytes is None:
+            return None
+
+        # PIL decode/resize is CPU-bound; keep it off the event loop
+        img_base64 = await asyncio.to_thread(resize_and_encode, image_bytes, platform)
 
     except Exception as e:
         print("Image Generation Error:", e)
         return None
 
+    _image_cache[cache_key] = img_base64
+    if len(_image_cache) > IMAGE_CACHE_SIZE:
+        _image_cache.popitem(last=False)
+
+    return img_base64
 
-def generate_thematic_images(captions, platform):
-    results = []
 
-    for caption in captions:
-        img_base64 = generate_image_from_caption(caption, platform)
+async def generate_thematic_images(captions, platform):
+    images = await asyncio.gather(
+        *(generate_image_from_caption(c, platform) for c in captions)
+    )
+
+    results = []
 
+    for caption, img_base64 in zip(captions, images):
         if img_base64:
             results.append({"image": img_base64, "caption": caption})
 
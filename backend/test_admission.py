@@ -0,0 +1,60 @@
+import asyncio
+
+from admission import AdmissionController, OverloadedError
+
+
+async def hold_slot(controller, priority_class, release):
+    async with controller.slot(priority_class):
+        await release.wait()
+
+
+def test_fast_request_is_queued_when_cancelled_waiter_is_still_listed():
+    async def scenario():
+        controller = AdmissionController(1, 1)
+        release = asyncio.Event()
+
+        holder = asyncio.create_task(hold_slot(controller, "full", release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold_slot(controller, "full", release))
+        await asyncio.sleep(0)
+
+        # Cancel the queued waiter and arrive with a fast request in the same tick,
+        # before the waiter's cleanup has removed its queue entry
+        fast = asyncio.create_task(hold_slot(controller, "fast", release))
+        waiter.cancel()
+        await asyncio.sleep(0)
+
+        release.set()
+        results = await asyncio.gather(holder, waiter, fast, return_exceptions=True)
+        return controller, results
+
+    controller, (holder, waiter, fast) = asyncio.run(scenario())
+
+    assert holder is None
+    assert isinstance(waiter, asyncio.CancelledError)
+    assert fast is None
+    assert controller.rejected == 0
+    assert controller.in_flight == 0
+    assert controller.queue_depth() == 0
+
+
+def test_fast_request_sheds_queued_full_request():
+    async def scenario():
+        controller = AdmissionController(1, 1)
+        release = asyncio.Event()
+
+        holder = asyncio.create_task(hold_slot(controller, "full", release))
+        await asyncio.sleep(0)
+        queued_full = asyncio.create_task(hold_slot(controller, "full", release))
+        await asyncio.sleep(0)
+        fast = asyncio.create_task(hold_slot(controller, "fast", release))
+        await asyncio.sleep(0)
+
+        release.set()
+        return await asyncio.gather(holder, queued_full, fast, return_exceptions=True)
+
+    holder, queued_full, fast = asyncio.run(scenario())
+
+    assert holder is None
+    assert isinstance(queued_full, OverloadedError)
+    assert fast is None
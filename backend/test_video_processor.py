@@ -0,0 +1,49 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+pytest.importorskip("pytesseract")
+
+from video_processor import frame_fingerprint, fingerprints_match
+
+
+def talking_head_frame():
+    frame = np.zeros((360, 640, 3), np.uint8)
+    for y in range(360):
+        frame[y, :] = (40 + y // 4, 60 + y // 6, 90)
+    cv2.ellipse(frame, (320, 170), (90, 120), 0, 0, 360, (150, 170, 200), -1)
+    cv2.rectangle(frame, (200, 280), (440, 360), (50, 50, 120), -1)
+    return cv2.GaussianBlur(frame, (7, 7), 0)
+
+
+def recompressed_gray(frame, seed):
+    rng = np.random.default_rng(seed)
+    noisy = np.clip(frame.astype(int) + rng.integers(-3, 4, frame.shape), 0, 255)
+    _, buffer = cv2.imencode(".jpg", noisy.astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 75])
+    return cv2.cvtColor(cv2.imdecode(buffer, cv2.IMREAD_COLOR), cv2.COLOR_BGR2GRAY)
+
+
+def test_recompressed_frame_is_memo_hit():
+    frame = talking_head_frame()
+    a = frame_fingerprint(recompressed_gray(frame, 0))
+    b = frame_fingerprint(recompressed_gray(frame, 1))
+    assert fingerprints_match(a, b)
+
+
+@pytest.mark.parametrize(
+    "text, origin, scale, thickness",
+    [
+        ("Subscribe for more tips!", (150, 335), 0.8, 2),
+        ("Jane Doe", (20, 40), 0.5, 1),
+    ],
+)
+def test_text_overlay_is_not_memo_hit(text, origin, scale, thickness):
+    frame = talking_head_frame()
+    overlay = frame.copy()
+    cv2.putText(
+        overlay, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), thickness
+    )
+
+    a = frame_fingerprint(recompressed_gray(frame, 0))
+    b = frame_fingerprint(recompressed_gray(overlay, 1))
+    assert not fingerprints_match(a, b)
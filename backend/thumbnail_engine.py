@@ -1,10 +1,24 @@
+import os
 import cv2
 import base64
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 FRAME_SAMPLE_INTERVAL_SECONDS = 0.5
 RESIZE_WIDTH = 640
 
+# Thumbnail variants: small preview for the grid, full-size for download, optional WebP
+PREVIEW_WIDTH = int(os.getenv("THUMBNAIL_PREVIEW_WIDTH", "320"))
+PREVIEW_JPEG_QUALITY = int(os.getenv("THUMBNAIL_PREVIEW_QUALITY", "70"))
+FULL_JPEG_QUALITY = int(os.getenv("THUMBNAIL_FULL_QUALITY", "90"))
+PROGRESSIVE_JPEG = os.getenv("THUMBNAIL_PROGRESSIVE_JPEG", "1") == "1"
+ENABLE_WEBP = os.getenv("THUMBNAIL_ENABLE_WEBP", "0") == "1"
+WEBP_QUALITY = int(os.getenv("THUMBNAIL_WEBP_QUALITY", "80"))
+
+# cv2.imencode releases the GIL, so a small thread pool encodes variants in parallel
+ENCODE_WORKERS = int(os.getenv("THUMBNAIL_ENCODE_WORKERS", "4"))
+encode_pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+
 
 def resize_frame(frame):
     h, w = frame.shape[:2]
@@ -47,13 +61,57 @@ def frame_sharpness_score(frame):
     return cv2.Laplacian(gray, cv2.CV_64F).var()
 
 
-def encode_image_to_base64(frame):
-    _, buffer = cv2.imencode(".jpg", frame)
+def encode_image_to_base64(frame, ext=".jpg", params=None):
+    _, buffer = cv2.imencode(ext, frame, params or [])
     jpg_as_text = base64.b64encode(buffer).decode("utf-8")
     return jpg_as_text
 
 
-def extract_top_thumbnails(video_path, fps, platform, max_thumbnails=10):
+def jpeg_params(quality):
+    return [
+        cv2.IMWRITE_JPEG_QUALITY, quality,
+        cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+        cv2.IMWRITE_JPEG_PROGRESSIVE, int(PROGRESSIVE_JPEG),
+    ]
+
+
+def resize_to_width(frame, width):
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    scale = width / w
+    return cv2.resize(frame, (width, int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def encode_preview(frame):
+    return encode_image_to_base64(
+        resize_to_width(frame, PREVIEW_WIDTH), ".jpg", jpeg_params(PREVIEW_JPEG_QUALITY)
+    )
+
+
+def encode_full(frame):
+    return encode_image_to_base64(frame, ".jpg", jpeg_params(FULL_JPEG_QUALITY))
+
+
+def encode_webp(frame):
+    return encode_image_to_base64(frame, ".webp", [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY])
+
+
+def encode_thumbnail_variants(frames, include_webp=ENABLE_WEBP):
+    encoders = {"preview": encode_preview, "full": encode_full}
+    if include_webp:
+        encoders["webp"] = encode_webp
+
+    # Submit every (frame, variant) pair up front so all encodes overlap
+    futures = [
+        {name: encode_pool.submit(encoder, frame) for name, encoder in encoders.items()}
+        for frame in frames
+    ]
+
+    return [{name: f.result() for name, f in variants.items()} for variants in futures]
+
+
+def select_top_frames(video_path, fps, platform, max_thumbnails=10):
     cap = cv2.VideoCapture(video_path)
 
     frame_interval = int(fps * FRAME_SAMPLE_INTERVAL_SECONDS)
@@ -93,8 +151,14 @@ def extract_top_thumbnails(video_path, fps, platform, max_thumbnails=10):
         if len(selected_frames) >= max_thumbnails:
             break
 
+    return selected_frames
+
+
+def extract_top_thumbnails(video_path, fps, platform, max_thumbnails=10):
+    selected_frames = select_top_frames(video_path, fps, platform, max_thumbnails)
+
     # Encode all selected frames
-    encoded_images = [encode_image_to_base64(f) for f in selected_frames]
+    encoded_images = list(encode_pool.map(encode_full, selected_frames))
 
     return encoded_images
 
@@ -11,6 +11,12 @@ pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tessera
 FRAME_SAMPLE_INTERVAL_SECONDS = 0.5
 RESIZE_WIDTH = 640
 
+# OCR memo: a frame reuses the last OCR'd frame's text-present result when their
+# edge-energy grids (morphological gradient, averaged per cell) differ by at most
+# OCR_FINGERPRINT_MAX_CELL_DIFF in every cell. Text overlays light up whole cells.
+OCR_FINGERPRINT_GRID = (32, 18)
+OCR_FINGERPRINT_MAX_CELL_DIFF = 8.0
+
 
 def resize_frame(frame):
     h, w = frame.shape[:2]
@@ -91,7 +97,27 @@ def calculate_average_motion(video_path, fps):
     return float(np.mean(motion_values)) if motion_values else 0.0
 
 
-def calculate_text_presence_ratio(video_path, fps):
+def frame_fingerprint(gray):
+    # Edge map keeps text strokes and drops flat regions like faces and backgrounds
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+    grid = cv2.resize(gradient, OCR_FINGERPRINT_GRID, interpolation=cv2.INTER_AREA)
+    return grid.astype(np.float32)
+
+
+def fingerprints_match(a, b):
+    return float(np.abs(a - b).max()) <= OCR_FINGERPRINT_MAX_CELL_DIFF
+
+
+def frame_has_text(gray):
+    try:
+        text = pytesseract.image_to_string(gray)
+        return len(text.strip()) > 5
+    except:
+        return False
+
+
+def calculate_text_presence_ratio(video_path, fps, stats=None):
     cap = cv2.VideoCapture(video_path)
 
     frame_interval = int(fps * FRAME_SAMPLE_INTERVAL_SECONDS)
@@ -100,6 +126,10 @@ def calculate_text_presence_ratio(video_path, fps):
     sampled = 0
     text_frames = 0
 
+    anchor_fingerprint = None
+    anchor_has_text = False
+    ocr_calls = 0
+
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -109,16 +139,30 @@ def calculate_text_presence_ratio(video_path, fps):
             frame = resize_frame(frame)
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-            try:
-                text = pytesseract.image_to_string(gray)
-                if len(text.strip()) > 5:
-                    text_frames += 1
-            except:
-                pass
+            fingerprint = frame_fingerprint(gray)
+
+            # Only the last OCR'd frame is trusted, so slow changes can't drift past it
+            if anchor_fingerprint is not None and fingerprints_match(
+                anchor_fingerprint, fingerprint
+            ):
+                has_text = anchor_has_text
+            else:
+                has_text = frame_has_text(gray)
+                anchor_fingerprint = fingerprint
+                anchor_has_text = has_text
+                ocr_calls += 1
+
+            if has_text:
+                text_frames += 1
 
             sampled += 1
 
         frame_index += 1
 
     cap.release()
+
+    if stats is not None:
+        stats["ocr_calls"] = ocr_calls
+        stats["ocr_calls_saved"] = sampled - ocr_calls
+
     return text_frames / sampled if sampled > 0 else 0.0
@@ -1,11 +1,20 @@
 import streamlit as st
 import requests
 import base64
-from PIL import Image
-from io import BytesIO
+import hashlib
+import os
+import tempfile
+import cv2
+from requests.adapters import HTTPAdapter
 
 BACKEND_URL = "https://llm-fast-api-project-video-intell.onrender.com/analyze"
 
+# Backend analyzes at 640 px anyway, so the optional proxy upload never needs more
+ANALYSIS_PROXY_WIDTH = 640
+
+# Mirrors the backend limit so long clips are rejected before any local transcode
+MAX_DURATION_SECONDS = 120
+
 st.set_page_config(page_title="Video Intelligence Studio", layout="wide")
 
 # ---------------------------
@@ -13,13 +22,138 @@ st.set_page_config(page_title="Video Intelligence Studio", layout="wide")
 # ---------------------------
 
 
-def decode_base64_image(base64_string):
-    image_bytes = base64.b64decode(base64_string)
-    return Image.open(BytesIO(image_bytes))
+class AnalysisError(Exception):
+    pass
+
+
+@st.cache_resource
+def get_session():
+    # One pooled keep-alive session shared across reruns
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def hash_file(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def make_analysis_proxy(file_bytes, file_name):
+    suffix = os.path.splitext(file_name)[1]
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as source:
+        source.write(file_bytes)
+
+    proxy_path = source.name + "_proxy.mp4"
+    cap = cv2.VideoCapture(source.name)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    writer = None
+
+    try:
+        if fps > 0 and total_frames / fps > MAX_DURATION_SECONDS:
+            raise AnalysisError("Video exceeds maximum allowed duration of 2 minutes.")
+
+        while fps > 0:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            h, w = frame.shape[:2]
+            if w > ANALYSIS_PROXY_WIDTH:
+                scale = ANALYSIS_PROXY_WIDTH / w
+                frame = cv2.resize(
+                    frame,
+                    (ANALYSIS_PROXY_WIDTH, int(h * scale) // 2 * 2),
+                    interpolation=cv2.INTER_AREA,
+                )
 
+            if writer is None:
+                fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+                writer = cv2.VideoWriter(
+                    proxy_path, fourcc, fps, (frame.shape[1], frame.shape[0])
+                )
+                if not writer.isOpened():
+                    # No mp4v encoder available; caller falls back to the original file
+                    return None
+
+            # Every frame is kept so fps, frame count and duration match the original
+            writer.write(frame)
+
+        if writer is None:
+            return None
+        writer.release()
+
+        if not os.path.exists(proxy_path) or os.path.getsize(proxy_path) == 0:
+            return None
+
+        with open(proxy_path, "rb") as proxy:
+            return proxy.read()
+
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+        for path in (source.name, proxy_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def analyze_video(file_hash, platform, use_proxy, file_name, mime_type, _file_bytes):
+    # Cached by (file_hash, platform, use_proxy); _file_bytes is excluded from the key
+    upload_bytes = _file_bytes
+    upload_name = file_name
+
+    if use_proxy:
+        try:
+            proxy_bytes = make_analysis_proxy(_file_bytes, file_name)
+        except cv2.error as e:
+            print("Proxy transcode failed, uploading original:", e)
+            proxy_bytes = None
+
+        # mp4v is far less efficient than phone H.264/HEVC; only send the proxy if it is smaller
+        if proxy_bytes is not None and len(proxy_bytes) < len(_file_bytes):
+            upload_bytes = proxy_bytes
+            upload_name = os.path.splitext(file_name)[0] + ".mp4"
+            mime_type = "video/mp4"
+
+    files = {"file": (upload_name, upload_bytes, mime_type)}
+    data = {"platform": platform}
+
+    response = get_session().post(BACKEND_URL, files=files, data=data)
+
+    # Errors are raised, not returned, so they are never cached
+    if response.status_code == 429:
+        retry_after = response.headers.get("Retry-After", "a few")
+        raise AnalysisError(f"Server is busy. Please retry in {retry_after} seconds.")
+
+    if response.status_code != 200:
+        try:
+            error_msg = response.json().get("detail", "An unknown error occurred.")
+        except ValueError:
+            error_msg = "An unknown error occurred."
+        raise AnalysisError(error_msg)
 
-def download_button(image_base64, filename):
-    image_bytes = base64.b64decode(image_base64)
+    return response.json()
+
+
+def decode_result_images(result):
+    # Decode every image once when the result is stored, not on each rerun
+    for thumb in result.get("thumbnails", []):
+        for variant, image_base64 in thumb.items():
+            thumb[variant] = base64.b64decode(image_base64)
+
+    for block in result.get("ai_results", []):
+        if block.get("image"):
+            block["image"] = base64.b64decode(block["image"])
+
+    return result
+
+
+def download_button(image_bytes, filename):
     st.download_button(
         label="Download JPG",
         data=image_bytes,
@@ -50,6 +184,11 @@ with col2:
         "Upload Video (Max 2 minutes)", type=["mp4", "mov", "avi"]
     )
 
+use_proxy = st.checkbox(
+    "Fast upload (send a 640 px analysis proxy instead of the original file)",
+    value=False,
+)
+
 analyze = st.button("Analyze Video", use_container_width=True)
 
 st.markdown("---")
@@ -59,134 +198,140 @@ st.markdown("---")
 # ---------------------------
 
 if analyze and uploaded_file:
-    with st.spinner("Analyzing video... This may take 10–20 seconds."):
-        files = {"file": (uploaded_file.name, uploaded_file, uploaded_file.type)}
-
-        data = {"platform": platform}
-
-        response = requests.post(BACKEND_URL, files=files, data=data)
-
-    if response.status_code != 200:
-        error_msg = response.json().get("detail", "An unknown error occurred.")
-        st.error(f"🚫 {error_msg}")
-    else:
-        result = response.json()
+    file_bytes = uploaded_file.getvalue()
+
+    try:
+        with st.spinner("Analyzing video... This may take 10–20 seconds."):
+            result = analyze_video(
+                hash_file(file_bytes),
+                platform,
+                use_proxy,
+                uploaded_file.name,
+                uploaded_file.type,
+                file_bytes,
+            )
+            st.session_state["result"] = decode_result_images(result)
+    except (AnalysisError, requests.RequestException) as e:
+        st.session_state.pop("result", None)
+        st.error(f"🚫 {e}")
 
-        # ---------------------------
-        # Metrics Section
-        # ---------------------------
-
-        st.subheader("📊 Video Metrics")
-        m = result["metrics"]
-
-        col1, col2, col3, col4, col5 = st.columns(5)
-
-        col1.metric("FPS", m["fps"])
-        col2.metric("Frames", m["total_frames"])
-        col3.metric("Cuts", m["hard_cut_count"])
-        col4.metric("Motion", round(m["avg_motion_magnitude"], 2))
-        col5.metric("Text %", round(m["text_present_ratio"] * 100, 1))
-
-        st.markdown("---")
-
-        # ---------------------------
-        # Top Thumbnails Section
-        # ---------------------------
-
-        st.subheader("🖼 Top 10 Thumbnails")
-
-        thumbs = result["thumbnails"]
+elif analyze:
+    st.warning("Please upload a video first.")
 
-        thumb_cols = st.columns(5)
+# Results survive reruns (e.g. download clicks) without another upload
+result = st.session_state.get("result")
 
-        for i, thumb in enumerate(thumbs):
-            img = decode_base64_image(thumb)
-            with thumb_cols[i % 5]:
-                st.image(img, use_container_width=True)
-                download_button(thumb, f"thumbnail_{i + 1}.jpg")
+if result:
+    # ---------------------------
+    # Metrics Section
+    # ---------------------------
 
-        st.markdown("---")
+    st.subheader("📊 Video Metrics")
+    m = result["metrics"]
 
-        # # ---------------------------
-        # # AI Thematic Thumbnails
-        # # ---------------------------
+    col1, col2, col3, col4, col5 = st.columns(5)
 
-        # st.subheader("🤖 AI Thematic Thumbnails")
+    col1.metric("FPS", m["fps"])
+    col2.metric("Frames", m["total_frames"])
+    col3.metric("Cuts", m["hard_cut_count"])
+    col4.metric("Motion", round(m["avg_motion_magnitude"], 2))
+    col5.metric("Text %", round(m["text_present_ratio"] * 100, 1))
 
-        # ai_blocks = result.get("ai_results", [])
+    st.markdown("---")
 
-        # for idx, block in enumerate(ai_blocks):
-        #     st.markdown(f"### Concept {idx + 1}")
+    # ---------------------------
+    # Top Thumbnails Section
+    # ---------------------------
 
-        #     image_base64 = block.get("image")
-        #     caption = block.get("caption")
+    st.subheader("🖼 Top 10 Thumbnails")
 
-        #     if image_base64:
-        #         img = decode_base64_image(image_base64)
-        #         st.image(img, use_container_width=True)
-        #         download_button(image_base64, f"ai_thumbnail_{idx+1}.jpg")
+    thumbs = result["thumbnails"]
 
-        #     if caption:
-        #         lines = caption.split("\n")
-        #         for line in lines:
-        #             st.write(line)
+    thumb_cols = st.columns(5)
 
-        #     st.markdown("---")
-        
-        # ---------------------------
-        # AI Captions (Thematic)
-        # ---------------------------
+    for i, thumb in enumerate(thumbs):
+        # Small preview in the grid, full-size JPG only for download
+        with thumb_cols[i % 5]:
+            st.image(thumb["preview"], use_container_width=True)
+            download_button(thumb["full"], f"thumbnail_{i + 1}.jpg")
 
-        st.subheader("🤖 AI Generated Captions")
+    st.markdown("---")
 
-        captions = result.get("captions", [])
+    # ---------------------------
+    # AI Thematic Thumbnails
+    # ---------------------------
 
-        if not captions:
-            st.warning("No captions were generated.")
-        else:
-            for idx, caption_lines in enumerate(captions[:3]):
-                st.markdown(f"### Concept {idx + 1}")
+    ai_blocks = result.get("ai_results", [])
 
-                # Ensure it's a list of 3 lines
-                if isinstance(caption_lines, list):
-                    lines = [str(line).strip() for line in caption_lines]
+    if ai_blocks:
+        st.subheader("🤖 AI Thematic Thumbnails")
 
-                    # Safety: ensure exactly 3
-                    while len(lines) < 3:
-                        lines.append("")
+        for idx, block in enumerate(ai_blocks):
+            st.markdown(f"### Concept {idx + 1}")
 
-                    lines = lines[:3]
+            image_bytes = block.get("image")
+            caption = block.get("caption")
 
-                    caption_text = "\n".join(lines)
+            if image_bytes:
+                st.image(image_bytes, use_container_width=True)
+                download_button(image_bytes, f"ai_thumbnail_{idx+1}.jpg")
 
-                    # # Styled caption card
-                    # st.markdown(
-                    #     f"""
-                    #     <div style="
-                    #         background-color:#161B22;
-                    #         padding:20px;
-                    #         border-radius:12px;
-                    #         margin-bottom:15px;
-                    #         border:1px solid #2A2F3A;
-                    #     ">
-                    #         <p style="font-size:16px; line-height:1.6; margin:0;">
-                    #             {lines[0]}<br><br>
-                    #             {lines[1]}<br><br>
-                    #             {lines[2]}
-                    #         </p>
-                    #     </div>
-                    #     """,
-                    #     unsafe_allow_html=True
-                    # )
+            if caption:
+                for line in caption:
+                    st.write(line)
 
-                    # Copy block
-                    st.code(caption_text, language="markdown")
+            st.markdown("---")
 
-                else:
-                    st.error(f"Caption {idx + 1} format invalid.")
+    # ---------------------------
+    # AI Captions (Thematic)
+    # ---------------------------
 
-                st.markdown("---")
+    st.subheader("🤖 AI Generated Captions")
 
+    captions = result.get("captions", [])
 
-elif analyze:
-    st.warning("Please upload a video first.")
+    if not captions:
+        st.warning("No captions were generated.")
+    else:
+        for idx, caption_lines in enumerate(captions[:3]):
+            st.markdown(f"### Concept {idx + 1}")
+
+            # Ensure it's a list of 3 lines
+            if isinstance(caption_lines, list):
+                lines = [str(line).strip() for line in caption_lines]
+
+                # Safety: ensure exactly 3
+                while len(lines) < 3:
+                    lines.append("")
+
+                lines = lines[:3]
+
+                caption_text = "\n".join(lines)
+
+                # # Styled caption card
+                # st.markdown(
+                #     f"""
+                #     <div style="
+                #         background-color:#161B22;
+                #         padding:20px;
+                #         border-radius:12px;
+                #         margin-bottom:15px;
+                #         border:1px solid #2A2F3A;
+                #     ">
+                #         <p style="font-size:16px; line-height:1.6; margin:0;">
+                #             {lines[0]}<br><br>
+                #             {lines[1]}<br><br>
+                #             {lines[2]}
+                #         </p>
+                #     </div>
+                #     """,
+                #     unsafe_allow_html=True
+                # )
+
+                # Copy block
+                st.code(caption_text, language="markdown")
+
+            else:
+                st.error(f"Caption {idx + 1} format invalid.")
+
+            st.markdown("---")